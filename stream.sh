@@ -3,31 +3,34 @@
 
 # Default values if environment variables are not set
 NGINX_RTMP_HOST=${NGINX_RTMP_HOST:-localhost}
+NGINX_RTMP_PORT=${NGINX_RTMP_PORT:-1935}
 STREAM_WIDTH=${STREAM_WIDTH:-1280}
 STREAM_HEIGHT=${STREAM_HEIGHT:-720}
 STREAM_FRAMERATE=${STREAM_FRAMERATE:-30}
 STREAM_PATH=${STREAM_PATH:-live/stream}
+# Number of camera buffers in flight; raise it if frames drop when ffmpeg stalls
+STREAM_BUFFER_COUNT=${STREAM_BUFFER_COUNT:-6}
 
 echo "[INFO] Starting camera streaming service (${STREAM_WIDTH}x${STREAM_HEIGHT}@${STREAM_FRAMERATE}fps)"
 
 # Wait for NGINX RTMP server to be ready, with less frequent messages
-echo "[INFO] Checking NGINX RTMP server at $NGINX_RTMP_HOST:1935..."
+echo "[INFO] Checking NGINX RTMP server at $NGINX_RTMP_HOST:$NGINX_RTMP_PORT..."
 retry_count=0
 max_retries=120
-until nc -z $NGINX_RTMP_HOST 1935; do
+until nc -z $NGINX_RTMP_HOST $NGINX_RTMP_PORT; do
     retry_count=$((retry_count+1))
     if [ $((retry_count % 5)) -eq 0 ]; then
-        echo "[INFO] Waiting for NGINX RTMP server at $NGINX_RTMP_HOST:1935... (attempt $retry_count/$max_retries)"
+        echo "[INFO] Waiting for NGINX RTMP server at $NGINX_RTMP_HOST:$NGINX_RTMP_PORT... (attempt $retry_count/$max_retries)"
     fi
     
     if [ $retry_count -ge $max_retries ]; then
-        echo "[ERROR] NGINX RTMP server at $NGINX_RTMP_HOST:1935 did not respond after $max_retries attempts"
+        echo "[ERROR] NGINX RTMP server at $NGINX_RTMP_HOST:$NGINX_RTMP_PORT did not respond after $max_retries attempts"
         exit 1
     fi
     
     sleep 2
 done
-echo "[INFO] NGINX RTMP server at $NGINX_RTMP_HOST:1935 ready"
+echo "[INFO] NGINX RTMP server at $NGINX_RTMP_HOST:$NGINX_RTMP_PORT ready"
 
 # Function to detect camera system
 detect_camera_system() {
@@ -42,18 +45,22 @@ detect_camera_system() {
 
 # Start streaming with rpicam
 start_streaming() {
-    RTMP_URL="rtmp://$NGINX_RTMP_HOST:1935/$STREAM_PATH"
+    RTMP_URL="rtmp://$NGINX_RTMP_HOST:$NGINX_RTMP_PORT/$STREAM_PATH"
     echo "[INFO] Streaming to: $RTMP_URL"
     
-    rpicam-vid -t 0 --width $STREAM_WIDTH --height $STREAM_HEIGHT --framerate $STREAM_FRAMERATE --codec h264 --inline --output - 2>/dev/null | \
-        ffmpeg -hide_banner -loglevel error -i - -c:v copy -f flv $RTMP_URL
+    rpicam-vid -t 0 --width $STREAM_WIDTH --height $STREAM_HEIGHT --framerate $STREAM_FRAMERATE --buffer-count $STREAM_BUFFER_COUNT --codec h264 --inline --output - 2>/dev/null | \
+        ffmpeg -hide_banner -loglevel error -thread_queue_size 512 -i - -c:v copy -f flv $RTMP_URL
 }
 
-# Handle graceful shutdown
+# Handle graceful shutdown: only stop our own pipeline, cleanup happens below
+shutting_down=0
 handle_shutdown() {
-    echo "[INFO] Shutting down camera streaming service..."
-    pkill -TERM -f "ffmpeg|rpicam-vid"
-    exit 0
+    # Nothing to clean up if the pipeline has not been started yet
+    if [ -z "$stream_pid" ]; then
+        exit 0
+    fi
+    shutting_down=1
+    pkill -TERM -P "$stream_pid"
 }
 
 # Register signal handlers
@@ -62,8 +69,18 @@ trap handle_shutdown SIGTERM SIGINT
 # Main execution
 detect_camera_system
 echo "[INFO] Camera streaming started"
-start_streaming
+# Run the pipeline in the background and block in wait, so signals are
+# handled immediately instead of after the pipeline exits
+start_streaming &
+stream_pid=$!
+wait $stream_pid
+
+if [ $shutting_down -eq 1 ]; then
+    echo "[INFO] Shutting down camera streaming service..."
+    wait $stream_pid
+    exit 0
+fi
 
 # This line should not be reached under normal operation
 echo "[ERROR] Streaming stopped unexpectedly. Exiting..."
-exit 1
\ No newline at end of file
+exit 1